@@ -0,0 +1,111 @@
+import itertools
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.models import Option, Poll
+from api.search import search_polls
+
+WORDS = [
+    "best", "favourite", "pizza", "topping", "language", "framework", "movie",
+    "season", "colour", "city", "holiday", "editor", "database", "coffee",
+    "breakfast", "weekend", "game", "book", "music", "sport", "team", "song",
+]
+
+# Word frequencies follow a Zipf distribution over a 20k word vocabulary so
+# common terms match a large share of polls and rare ones only a handful.
+VOCABULARY = WORDS + ["word{}".format(i) for i in range(20_000 - len(WORDS))]
+CUMULATIVE_WEIGHTS = list(
+    itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY)))
+)
+
+
+def random_text(rng, words):
+    return " ".join(rng.choices(VOCABULARY, cum_weights=CUMULATIVE_WEIGHTS, k=words))
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with generated polls and measures search latency. "
+        "Everything runs in a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--polls", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.seed(rng, options["polls"], options["batch_size"])
+            self.stdout.write(
+                "Seeded {} polls in {:.1f}s".format(
+                    options["polls"], time.perf_counter() - started
+                )
+            )
+
+            for label, query in [
+                ("common term", "best"),
+                ("two terms", "favourite pizza"),
+                ("prefix", "data"),
+                ("rare term", "word12345"),
+            ]:
+                self.measure(label, query, options["queries"])
+
+            self.measure_pages("best", pages=10)
+
+            transaction.set_rollback(True)
+
+    def seed(self, rng, count, batch_size):
+        for offset in range(0, count, batch_size):
+            polls = [
+                Poll(
+                    title=random_text(rng, 4),
+                    is_private=rng.random() < 0.1,
+                )
+                for _ in range(min(batch_size, count - offset))
+            ]
+            Poll.objects.bulk_create(polls)
+            Option.objects.bulk_create(
+                Option(poll=poll, value=random_text(rng, 2))
+                for poll in polls
+                for _ in range(2)
+            )
+
+    def measure(self, label, query, runs):
+        timings = []
+
+        for _ in range(runs):
+            started = time.perf_counter()
+            search_polls(query)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        self.stdout.write(
+            "{:<12} q={!r:<18} median {:.2f}ms  p95 {:.2f}ms".format(
+                label,
+                query,
+                statistics.median(timings),
+                timings[int(len(timings) * 0.95) - 1],
+            )
+        )
+
+    def measure_pages(self, query, pages):
+        cursor = None
+        started = time.perf_counter()
+
+        for _ in range(pages):
+            _, cursor = search_polls(query, cursor)
+
+            if cursor is None:
+                break
+
+        self.stdout.write(
+            "{} pages of {!r}: {:.2f}ms".format(
+                pages, query, (time.perf_counter() - started) * 1000
+            )
+        )
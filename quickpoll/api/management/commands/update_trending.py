@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from api.trending import process_new_votes
+
+
+class Command(BaseCommand):
+    help = (
+        "Folds votes cast since the last run into the trending ranking. "
+        "With --interval it keeps running and does so periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=None)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        while True:
+            processed = self.run_once(options["batch_size"])
+            self.stdout.write("Processed {} votes".format(processed))
+
+            if options["interval"] is None:
+                return
+
+            time.sleep(options["interval"])
+
+    def run_once(self, batch_size):
+        processed = 0
+
+        while True:
+            count = process_new_votes(batch_size)
+            processed += count
+
+            if count < batch_size:
+                return processed
@@ -0,0 +1,108 @@
+from django.db import migrations
+
+# Poll ids are UUIDs, so api_pollsearchdoc hands out the integer rowids the
+# FTS5 table is keyed on. Only public polls get a row in api_pollsearch; the
+# options of a poll are indexed together in its "value" column.
+POLL_OPTIONS = (
+    "COALESCE((SELECT group_concat(value, ' ') FROM api_option "
+    "WHERE poll_id = {poll}), '')"
+)
+POLL_DOC = "(SELECT id FROM api_pollsearchdoc WHERE poll_id = {poll})"
+
+CREATE_INDEX = [
+    """
+    CREATE TABLE api_pollsearchdoc (
+        id INTEGER PRIMARY KEY,
+        poll_id CHAR(32) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE api_pollsearch USING fts5(
+        title,
+        value,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    # Title matches weigh twice as much as option matches.
+    "INSERT INTO api_pollsearch (api_pollsearch, rank) VALUES ('rank', 'bm25(2.0, 1.0)')",
+    """
+    CREATE TRIGGER api_poll_search_ai AFTER INSERT ON api_poll BEGIN
+        INSERT INTO api_pollsearchdoc (poll_id) VALUES (NEW.id);
+        INSERT INTO api_pollsearch (rowid, title, value)
+        SELECT last_insert_rowid(), NEW.title, '' WHERE NEW.is_private = 0;
+    END
+    """,
+    """
+    CREATE TRIGGER api_poll_search_au AFTER UPDATE OF title, is_private ON api_poll BEGIN
+        DELETE FROM api_pollsearch WHERE rowid = {doc};
+        INSERT INTO api_pollsearch (rowid, title, value)
+        SELECT {doc}, NEW.title, {options} WHERE NEW.is_private = 0;
+    END
+    """.format(doc=POLL_DOC.format(poll="NEW.id"), options=POLL_OPTIONS.format(poll="NEW.id")),
+    """
+    CREATE TRIGGER api_poll_search_ad AFTER DELETE ON api_poll BEGIN
+        DELETE FROM api_pollsearch WHERE rowid = {doc};
+        DELETE FROM api_pollsearchdoc WHERE poll_id = OLD.id;
+    END
+    """.format(doc=POLL_DOC.format(poll="OLD.id")),
+    """
+    CREATE TRIGGER api_option_search_ai AFTER INSERT ON api_option BEGIN
+        UPDATE api_pollsearch SET value = {options} WHERE rowid = {doc};
+    END
+    """.format(doc=POLL_DOC.format(poll="NEW.poll_id"), options=POLL_OPTIONS.format(poll="NEW.poll_id")),
+    """
+    CREATE TRIGGER api_option_search_au AFTER UPDATE OF value ON api_option BEGIN
+        UPDATE api_pollsearch SET value = {options} WHERE rowid = {doc};
+    END
+    """.format(doc=POLL_DOC.format(poll="NEW.poll_id"), options=POLL_OPTIONS.format(poll="NEW.poll_id")),
+    """
+    CREATE TRIGGER api_option_search_ad AFTER DELETE ON api_option BEGIN
+        UPDATE api_pollsearch SET value = {options} WHERE rowid = {doc};
+    END
+    """.format(doc=POLL_DOC.format(poll="OLD.poll_id"), options=POLL_OPTIONS.format(poll="OLD.poll_id")),
+    "INSERT INTO api_pollsearchdoc (poll_id) SELECT id FROM api_poll ORDER BY created_at",
+    """
+    INSERT INTO api_pollsearch (rowid, title, value)
+    SELECT d.id, p.title, {options}
+    FROM api_poll AS p
+    INNER JOIN api_pollsearchdoc AS d ON d.poll_id = p.id
+    WHERE p.is_private = 0
+    """.format(options=POLL_OPTIONS.format(poll="p.id")),
+]
+
+DROP_INDEX = [
+    "DROP TRIGGER IF EXISTS api_option_search_ad",
+    "DROP TRIGGER IF EXISTS api_option_search_au",
+    "DROP TRIGGER IF EXISTS api_option_search_ai",
+    "DROP TRIGGER IF EXISTS api_poll_search_ad",
+    "DROP TRIGGER IF EXISTS api_poll_search_au",
+    "DROP TRIGGER IF EXISTS api_poll_search_ai",
+    "DROP TABLE IF EXISTS api_pollsearch",
+    "DROP TABLE IF EXISTS api_pollsearchdoc",
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite only, which is the only backend the project ships.
+        if schema_editor.connection.vendor != "sqlite":
+            return
+
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_poll_is_private'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_sqlite(CREATE_INDEX),
+            run_on_sqlite(DROP_INDEX),
+        ),
+    ]
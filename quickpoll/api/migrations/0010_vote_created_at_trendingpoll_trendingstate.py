@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_poll_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPoll',
+            fields=[
+                ('poll', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='api.poll')),
+                ('score', models.FloatField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_vote_id', models.BigIntegerField(default=0)),
+                ('epoch', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
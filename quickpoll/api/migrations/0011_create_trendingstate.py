@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Max
+from django.utils import timezone
+
+
+def create_state(apps, schema_editor):
+    TrendingState = apps.get_model("api", "TrendingState")
+    Vote = apps.get_model("api", "Vote")
+    db = schema_editor.connection.alias
+
+    # Votes that existed before 0010 all got its migration time as created_at,
+    # which says nothing about when they were cast. Start right after them so
+    # every vote with a real timestamp is counted.
+    applied = (
+        MigrationRecorder(schema_editor.connection)
+        .migration_qs.get(app="api", name="0010_vote_created_at_trendingpoll_trendingstate")
+        .applied
+    )
+    last_vote_id = (
+        Vote.objects.using(db)
+        .filter(created_at__lte=applied)
+        .aggregate(last=Max("id"))["last"]
+    )
+
+    TrendingState.objects.using(db).get_or_create(
+        pk=1,
+        defaults={"last_vote_id": last_vote_id or 0, "epoch": timezone.now()},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_vote_created_at_trendingpoll_trendingstate'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_state, migrations.RunPython.noop),
+    ]
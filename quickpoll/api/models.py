@@ -65,3 +65,14 @@ class Vote(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True)
     option = models.ForeignKey(Option, on_delete=models.CASCADE)
     poll = models.ForeignKey(Poll, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class TrendingPoll(models.Model):
+    poll = models.OneToOneField(Poll, on_delete=models.CASCADE, primary_key=True)
+    score = models.FloatField(db_index=True)
+
+
+class TrendingState(models.Model):
+    last_vote_id = models.BigIntegerField(default=0)
+    epoch = models.DateTimeField()
@@ -0,0 +1,104 @@
+import contextlib
+import contextvars
+import functools
+import random
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from django.core.cache import caches
+from .functions import get_client_ip
+
+# Alias reads should go to while a view runs inside replica_reads(), None
+# everywhere else so that reads default to the primary.
+_read_alias = contextvars.ContextVar("read_alias", default=None)
+
+
+class ReplicaRouter:
+    """
+    Sends reads made inside replica_reads() to a replica and everything else,
+    writes included, to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+
+def pin_key(request) -> str:
+    return "pin:{}".format(get_client_ip(request))
+
+
+def pin_to_primary(request):
+    """
+    Makes the client's reads skip the replicas for a while after it writes,
+    so it sees its own writes even when the replicas lag behind.
+    """
+    if len(settings.DATABASE_REPLICAS) > 0:
+        caches[settings.REPLICA_PIN_CACHE].set(
+            pin_key(request), True, settings.REPLICA_PIN_SECONDS
+        )
+
+
+def is_pinned(request) -> bool:
+    return caches[settings.REPLICA_PIN_CACHE].get(pin_key(request), False)
+
+
+@contextlib.contextmanager
+def replica_reads(request):
+    if len(settings.DATABASE_REPLICAS) == 0 or is_pinned(request):
+        yield
+        return
+
+    token = _read_alias.set(random.choice(settings.DATABASE_REPLICAS))
+
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+@register(Tags.caches)
+def check_pin_cache(app_configs, **kwargs):
+    if len(settings.DATABASE_REPLICAS) == 0:
+        return []
+
+    if settings.REPLICA_PIN_CACHE not in settings.CACHES:
+        return [
+            Error(
+                "REPLICA_PIN_CACHE refers to an unknown cache {!r}.".format(
+                    settings.REPLICA_PIN_CACHE
+                ),
+                hint="Set REPLICA_PIN_CACHE to one of the aliases in CACHES.",
+                id="api.E001",
+            )
+        ]
+
+    backend = settings.CACHES[settings.REPLICA_PIN_CACHE]["BACKEND"]
+
+    if backend != "django.core.cache.backends.locmem.LocMemCache":
+        return []
+
+    return [
+        Warning(
+            "REPLICA_PIN_CACHE is a per-process cache.",
+            hint=(
+                "Read-your-writes pins only hold within one worker process. "
+                "Point REPLICA_PIN_CACHE at a shared cache when running several."
+            ),
+            id="api.W001",
+        )
+    ]
+
+
+def read_from_replica(method):
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        with replica_reads(request):
+            return method(self, request, *args, **kwargs)
+
+    return wrapper
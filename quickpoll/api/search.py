@@ -0,0 +1,154 @@
+import re
+import secrets
+from typing import List, Optional, Tuple
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.db import connection
+from .models import Poll
+
+SEARCH_PAGE_SIZE = 25
+
+# Ranking has to score every match, which gets slow for terms that appear in
+# most polls. Only the newest SEARCH_CANDIDATES matches are ranked; the index
+# rowids grow with poll creation so the newest matches have the highest ones.
+SEARCH_CANDIDATES = 5000
+
+# The index only holds public polls (see migration 0009), so no join against
+# api_poll is needed to filter out private ones.
+RANKING_SQL = """
+    SELECT s.rowid
+    FROM api_pollsearch AS s
+    WHERE api_pollsearch MATCH %s AND s.rowid >= COALESCE((
+        SELECT rowid FROM api_pollsearch
+        WHERE api_pollsearch MATCH %s
+        ORDER BY rowid DESC
+        LIMIT 1 OFFSET %s
+    ), 0)
+    ORDER BY s.rank, s.rowid
+    LIMIT %s
+"""
+
+DOCUMENTS_SQL = "SELECT id, poll_id FROM api_pollsearchdoc WHERE id IN ({})"
+
+# Token of the stored ranking and offset of the next page in it.
+Cursor = Tuple[str, int]
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def build_match_expression(query: str) -> Optional[str]:
+    terms = re.findall(r"\w+", query)
+
+    if len(terms) == 0:
+        return None
+
+    # Every term is quoted so user input can't use FTS5 operators, and
+    # prefix-matched so partially typed words still hit.
+    return " ".join('"{}"*'.format(term) for term in terms)
+
+
+# bm25 scores shift whenever polls are added, so the first page ranks all
+# candidates once and stores the ranked index rowids; later pages are slices
+# of that list. Cursors are signed so they can only point at stored rankings.
+CURSOR_SALT = "api.search.cursor"
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    return signing.dumps(list(cursor), salt=CURSOR_SALT)
+
+
+def decode_cursor(value: str) -> Optional[Cursor]:
+    try:
+        token, offset = signing.loads(value, salt=CURSOR_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+
+    if not isinstance(token, str) or not isinstance(offset, int) or offset < 0:
+        return None
+
+    return token, offset
+
+
+def rank_matches(match: str) -> List[int]:
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(
+            RANKING_SQL, [match, match, SEARCH_CANDIDATES - 1, SEARCH_CANDIDATES]
+        )
+        return [rowid for rowid, in db_cursor.fetchall()]
+
+
+def store_ranking(ranking: List[int]) -> str:
+    token = secrets.token_urlsafe(16)
+    caches[settings.SEARCH_CURSOR_CACHE].set(
+        "search:{}".format(token), ranking, settings.SEARCH_CURSOR_SECONDS
+    )
+    return token
+
+
+def load_ranking(token: str) -> List[int]:
+    ranking = caches[settings.SEARCH_CURSOR_CACHE].get("search:{}".format(token))
+
+    if ranking is None:
+        raise CursorExpired
+
+    return ranking
+
+
+def load_polls(rowids: List[int]) -> List[Poll]:
+    if len(rowids) == 0:
+        return []
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(
+            DOCUMENTS_SQL.format(", ".join(["%s"] * len(rowids))), rowids
+        )
+        # SQLite stores UUIDs as 32 character hex strings.
+        poll_ids = {
+            rowid: Poll._meta.pk.to_python(poll_id)
+            for rowid, poll_id in db_cursor.fetchall()
+        }
+
+    # Polls deleted or made private since the ranking was stored are skipped.
+    polls = Poll.objects.filter(is_private=False).in_bulk(list(poll_ids.values()))
+
+    return [
+        polls[poll_ids[rowid]]
+        for rowid in rowids
+        if rowid in poll_ids and poll_ids[rowid] in polls
+    ]
+
+
+def search_polls(
+    query: str,
+    cursor: Optional[Cursor] = None,
+    limit: int = SEARCH_PAGE_SIZE,
+) -> Tuple[List[Poll], Optional[Cursor]]:
+    """
+    Returns a page of public polls whose title or options match ``query``,
+    best match first, together with the cursor of the next page (or None).
+    Raises CursorExpired if the ranking ``cursor`` points at is gone.
+    """
+    if cursor is None:
+        match = build_match_expression(query)
+
+        if match is None:
+            return [], None
+
+        token, offset = None, 0
+        ranking = rank_matches(match)
+    else:
+        token, offset = cursor
+        ranking = load_ranking(token)
+
+    next_cursor = None
+
+    if offset + limit < len(ranking):
+        if token is None:
+            token = store_ranking(ranking)
+
+        next_cursor = (token, offset + limit)
+
+    return load_polls(ranking[offset : offset + limit]), next_cursor
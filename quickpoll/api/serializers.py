@@ -11,6 +11,10 @@ class PollSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class TrendingPollSerializer(PollSerializer):
+    votes_per_minute = serializers.FloatField()
+
+
 class OptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Option
@@ -1,3 +1,403 @@
-from django.test import TestCase
+import base64
+import datetime
+import importlib
+from types import SimpleNamespace
+from unittest import mock
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache, caches
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .models import Option, Poll, TrendingPoll, TrendingState, User, Vote
+from .search import search_polls
+from .routers import ReplicaRouter, check_pin_cache, pin_to_primary, replica_reads
+from .throttling import MemoryTokenBucketStore, get_store
+from .trending import TIME_CONSTANT, get_trending_polls, process_new_votes
 
-# Create your tests here.
+
+def create_poll(title, options=("yes", "no"), is_private=False):
+    poll = Poll.objects.create(title=title, is_private=is_private)
+
+    for value in options:
+        Option.objects.create(poll=poll, value=value)
+
+    return poll
+
+
+class PollSearchIndexTests(TestCase):
+    def search(self, query):
+        response = self.client.get(reverse("poll_search"), {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [poll["title"] for poll in response.json()["results"]]
+
+    def test_private_poll_is_found_once_public(self):
+        poll = create_poll("secret ballot", is_private=True)
+
+        self.assertEqual(self.search("secret"), [])
+
+        poll.is_private = False
+        poll.save()
+
+        self.assertEqual(self.search("secret"), ["secret ballot"])
+
+    def test_public_poll_is_hidden_once_private(self):
+        poll = create_poll("secret ballot")
+
+        poll.is_private = True
+        poll.save()
+
+        self.assertEqual(self.search("secret"), [])
+
+    def test_title_rename_is_reflected(self):
+        poll = create_poll("best pizza")
+
+        poll.title = "worst pizza"
+        poll.save()
+
+        self.assertEqual(self.search("best"), [])
+        self.assertEqual(self.search("worst"), ["worst pizza"])
+
+    def test_option_changes_are_reflected(self):
+        poll = create_poll("lunch", options=("soup", "salad"))
+        option = poll.option_set.get(value="soup")
+
+        option.value = "noodles"
+        option.save()
+
+        self.assertEqual(self.search("soup"), [])
+        self.assertEqual(self.search("noodles"), ["lunch"])
+
+        option.delete()
+
+        self.assertEqual(self.search("noodles"), [])
+        self.assertEqual(self.search("salad"), ["lunch"])
+
+    def test_deleted_poll_is_removed(self):
+        poll = create_poll("best pizza")
+        create_poll("best pasta")
+
+        poll.delete()
+
+        self.assertEqual(self.search("best"), ["best pasta"])
+
+
+class PollSearchPaginationTests(TestCase):
+    def search(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def follow_all(self, url):
+        titles = []
+
+        while url is not None:
+            page = self.search(url)
+            titles += [poll["title"] for poll in page["results"]]
+            url = page["next"]
+
+        return titles
+
+    def test_next_visits_each_match_once(self):
+        for i in range(60):
+            create_poll("zebra {}".format(i))
+
+        create_poll("unrelated")
+
+        titles = self.follow_all(reverse("poll_search") + "?q=zebra")
+
+        self.assertEqual(len(titles), 60)
+        self.assertEqual(len(set(titles)), 60)
+
+    @mock.patch("api.search.SEARCH_CANDIDATES", 40)
+    def test_window_is_kept_while_new_polls_are_created(self):
+        for i in range(60):
+            create_poll("zebra {}".format(i))
+
+        page = self.search(reverse("poll_search") + "?q=zebra")
+        titles = [poll["title"] for poll in page["results"]]
+
+        for i in range(30):
+            create_poll("zebra new {}".format(i))
+
+        titles += self.follow_all(page["next"])
+
+        self.assertEqual(
+            sorted(titles), sorted("zebra {}".format(i) for i in range(20, 60))
+        )
+
+    def test_pages_keep_first_ranking_when_scores_shift(self):
+        create_poll("alpha alpha alpha beta")
+        create_poll("alpha beta beta beta")
+
+        first, cursor = search_polls("alpha beta", limit=1)
+
+        # Many new "alpha" polls make "alpha" worth less than "beta", which moves
+        # the "beta" heavy poll ahead.
+        for i in range(200):
+            create_poll("alpha filler {}".format(i))
+
+        second, cursor = search_polls("alpha beta", cursor, limit=1)
+
+        self.assertEqual(
+            sorted(poll.title for poll in first + second),
+            ["alpha alpha alpha beta", "alpha beta beta beta"],
+        )
+        self.assertIsNone(cursor)
+
+    def test_expired_cursor_is_rejected(self):
+        for i in range(30):
+            create_poll("zebra {}".format(i))
+
+        page = self.search(reverse("poll_search") + "?q=zebra")
+        cache.clear()
+
+        response = self.client.get(page["next"])
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor_is_rejected(self):
+        create_poll("zebra")
+
+        forged = signing.dumps(["token", 0], salt="another.salt")
+        unsigned = base64.urlsafe_b64encode(b"0:0:999999999").decode()
+
+        for cursor in [forged, unsigned, forged[:-1]]:
+            response = self.client.get(
+                reverse("poll_search"), {"q": "zebra", "cursor": cursor}
+            )
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"message": "Invalid cursor."})
+
+
+class TrendingTests(TestCase):
+    def vote(self, poll, count):
+        option = poll.option_set.first()
+
+        for _ in range(count):
+            Vote.objects.create(poll=poll, option=option)
+
+    def test_state_is_created_by_migration(self):
+        self.assertEqual(TrendingState.objects.get(pk=1).last_vote_id, 0)
+
+    def test_changing_option_is_not_counted_again(self):
+        poll = create_poll("lunch")
+        soup, salad = poll.option_set.order_by("id")
+        self.client.post(reverse("users"), REMOTE_ADDR="10.0.1.1")
+
+        for option, status_code in [(soup, 201), (salad, 200), (soup, 200)]:
+            response = self.client.post(
+                reverse("votes"),
+                {"poll": str(poll.id), "option": option.id},
+                content_type="application/json",
+                REMOTE_ADDR="10.0.1.1",
+            )
+            self.assertEqual(response.status_code, status_code)
+
+        vote = Vote.objects.get(poll=poll)
+        self.assertEqual(vote.option, soup)
+        self.assertEqual(process_new_votes(), 1)
+
+    def test_new_votes_are_ranked(self):
+        quiet = create_poll("quiet")
+        busy = create_poll("busy")
+        private = create_poll("private", is_private=True)
+
+        self.vote(quiet, 1)
+        self.vote(busy, 3)
+        self.vote(private, 5)
+
+        self.assertEqual(process_new_votes(batch_size=2), 2)
+        self.assertEqual(process_new_votes(), 7)
+        self.assertEqual(process_new_votes(), 0)
+
+        self.assertEqual(
+            [poll.title for poll in get_trending_polls()], ["busy", "quiet"]
+        )
+
+    def test_migration_skips_votes_from_before_created_at(self):
+        poll = create_poll("old")
+        self.vote(poll, 2)
+        cast_after = Vote.objects.create(poll=poll, option=poll.option_set.first())
+
+        cutoff = timezone.now() - datetime.timedelta(days=1)
+        Vote.objects.exclude(pk=cast_after.pk).update(created_at=cutoff)
+        MigrationRecorder.Migration.objects.filter(
+            app="api", name="0010_vote_created_at_trendingpoll_trendingstate"
+        ).update(applied=cutoff)
+        TrendingState.objects.all().delete()
+
+        migration = importlib.import_module("api.migrations.0011_create_trendingstate")
+        migration.create_state(apps, SimpleNamespace(connection=connection))
+
+        state = TrendingState.objects.get(pk=1)
+        self.assertEqual(state.last_vote_id, cast_after.pk - 1)
+        self.assertEqual(process_new_votes(), 1)
+
+    def test_votes_per_minute_decays(self):
+        poll = create_poll("lunch")
+        self.vote(poll, 2)
+        half_life_ago = timezone.now() - datetime.timedelta(
+            seconds=settings.TRENDING_HALF_LIFE_SECONDS
+        )
+        Vote.objects.update(created_at=half_life_ago)
+        process_new_votes()
+
+        # Two votes a half-life ago weigh as much as one vote cast just now.
+        [trending] = get_trending_polls()
+        self.assertAlmostEqual(trending.votes_per_minute, 60 / TIME_CONSTANT, places=4)
+
+    def test_rebase_keeps_rates_and_drops_tiny_scores(self):
+        kept = create_poll("kept")
+        dropped = create_poll("dropped")
+        TrendingPoll.objects.create(poll=kept, score=3 * 2**17)
+        TrendingPoll.objects.create(poll=dropped, score=1)
+        TrendingState.objects.update(
+            epoch=timezone.now()
+            - datetime.timedelta(seconds=settings.TRENDING_HALF_LIFE_SECONDS * 17)
+        )
+        rate_before = get_trending_polls()[0].votes_per_minute
+
+        process_new_votes()
+
+        state = TrendingState.objects.get(pk=1)
+        self.assertLess(timezone.now() - state.epoch, datetime.timedelta(minutes=1))
+        self.assertEqual(
+            list(TrendingPoll.objects.values_list("poll_id", flat=True)), [kept.id]
+        )
+        self.assertAlmostEqual(TrendingPoll.objects.get().score, 3, places=3)
+        self.assertAlmostEqual(
+            get_trending_polls()[0].votes_per_minute, rate_before, places=4
+        )
+
+    def test_trending_endpoint(self):
+        quiet = create_poll("quiet")
+        busy = create_poll("busy")
+        self.vote(quiet, 1)
+        self.vote(busy, 2)
+        process_new_votes()
+
+        response = self.client.get(reverse("poll_trending"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(poll["id"], poll["title"]) for poll in response.json()],
+            [(str(busy.id), "busy"), (str(quiet.id), "quiet")],
+        )
+        self.assertAlmostEqual(
+            response.json()[0]["votes_per_minute"], 2 * 60 / TIME_CONSTANT, places=3
+        )
+
+
+@override_settings(THROTTLE_CACHE=None, THROTTLE_MAX_CLIENTS=1000)
+class ThrottlingTests(TestCase):
+    def test_user_creation_is_throttled(self):
+        for _ in range(5):
+            self.client.post(reverse("users"), REMOTE_ADDR="10.0.0.1")
+
+        with self.assertLogs("api.throttling", "WARNING") as logs:
+            response = self.client.post(reverse("users"), REMOTE_ADDR="10.0.0.1")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "12")
+        self.assertIn(
+            "users request from 10.0.0.1 (1 throttled so far)", logs.output[0]
+        )
+        self.assertEqual(get_store().throttled_count("users"), 1)
+
+        with self.assertLogs("api.throttling", "WARNING") as logs:
+            for _ in range(7):
+                self.client.post(reverse("users"), REMOTE_ADDR="10.0.0.1")
+
+        self.assertEqual(len(logs.output), 3)
+        self.assertIn("(8 throttled so far)", logs.output[2])
+        self.assertEqual(get_store().throttled_count("users"), 8)
+
+        other = self.client.post(reverse("users"), REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(other.status_code, 201)
+
+    def test_store_follows_settings(self):
+        store = get_store()
+
+        with override_settings(THROTTLE_MAX_CLIENTS=16):
+            self.assertIsNot(get_store(), store)
+            self.assertEqual(get_store().shard_size, 1)
+
+        self.assertIsInstance(get_store(), MemoryTokenBucketStore)
+        self.assertEqual(get_store().shard_size, 1000 // 16)
+
+
+@override_settings(
+    DATABASE_REPLICAS=["replica"],
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "pins": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "pins",
+        },
+    },
+    REPLICA_PIN_CACHE="pins",
+)
+class ReplicaRoutingTests(TestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        caches["pins"].clear()
+
+    def read_alias(self, ip):
+        request = RequestFactory().get("/", REMOTE_ADDR=ip)
+
+        with replica_reads(request):
+            return ReplicaRouter().db_for_read(Poll)
+
+    def test_reads_go_to_replica_until_client_writes(self):
+        self.assertEqual(self.read_alias("10.0.0.1"), "replica")
+
+        pin_to_primary(RequestFactory().post("/", REMOTE_ADDR="10.0.0.1"))
+
+        self.assertIsNone(self.read_alias("10.0.0.1"))
+        self.assertEqual(self.read_alias("10.0.0.2"), "replica")
+
+    def test_client_reads_own_vote_from_primary(self):
+        # The replica only has what existed before the vote; nothing copies
+        # writes to it in tests, so it stays behind like a lagging replica.
+        poll = create_poll("lunch")
+        voter = User.objects.create(ip="10.0.0.1")
+        other = User.objects.create(ip="10.0.0.2")
+
+        for obj in [poll, *poll.option_set.all(), voter, other]:
+            obj.save(using="replica")
+
+        url = reverse("poll_details", args=[poll.id])
+        before = self.client.get(url, REMOTE_ADDR="10.0.0.1").json()
+        self.assertEqual(before["votes"], [])
+
+        response = self.client.post(
+            reverse("votes"),
+            {"poll": str(poll.id), "option": poll.option_set.first().id},
+            content_type="application/json",
+            REMOTE_ADDR="10.0.0.1",
+        )
+        self.assertEqual(response.status_code, 201)
+
+        own = self.client.get(url, REMOTE_ADDR="10.0.0.1").json()
+        self.assertEqual(len(own["votes"]), 1)
+        self.assertIsNotNone(own["user_vote"])
+
+        stale = self.client.get(url, REMOTE_ADDR="10.0.0.2").json()
+        self.assertEqual(stale["votes"], [])
+
+    def test_reads_outside_views_go_to_primary(self):
+        self.assertIsNone(ReplicaRouter().db_for_read(Poll))
+        self.assertEqual(ReplicaRouter().db_for_write(Poll), "default")
+
+    def test_per_process_pin_cache_is_flagged(self):
+        self.assertEqual([error.id for error in check_pin_cache(None)], ["api.W001"])
+
+    @override_settings(REPLICA_PIN_CACHE="missing")
+    def test_unknown_pin_cache_is_an_error(self):
+        self.assertEqual([error.id for error in check_pin_cache(None)], ["api.E001"])
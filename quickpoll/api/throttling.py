@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from typing import Optional, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from .functions import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+SHARD_COUNT = 16
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    # Same "<requests>/<period>" format as the rest of DRF, e.g. "30/min".
+    num, period = rate.split("/")
+    return int(num), PERIODS[period[0]]
+
+
+def take_token(bucket, capacity: int, refill_rate: float, now: float):
+    """
+    Refills ``bucket`` (tokens, last_refill) up to ``now`` and tries to take
+    one token out of it. Returns the new bucket and how many seconds the
+    caller has to wait, which is 0 if the token was taken.
+    """
+    if bucket is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+
+    return (tokens, now), (1 - tokens) / refill_rate
+
+
+class MemoryTokenBucketStore:
+    """
+    Keeps buckets in process memory, split over shards with their own lock so
+    concurrent requests rarely wait on each other. Every shard holds at most
+    ``max_keys / SHARD_COUNT`` buckets and forgets the least recently used one
+    when it is full.
+    """
+
+    def __init__(self, max_keys: int):
+        self.shard_size = max(1, max_keys // SHARD_COUNT)
+        self.shards = [OrderedDict() for _ in range(SHARD_COUNT)]
+        self.locks = [threading.Lock() for _ in range(SHARD_COUNT)]
+        self.throttled = Counter()
+        self.throttled_lock = threading.Lock()
+
+    def consume(self, key: str, capacity: int, refill_rate: float) -> float:
+        index = zlib.crc32(key.encode()) % SHARD_COUNT
+        shard = self.shards[index]
+
+        with self.locks[index]:
+            bucket, wait = take_token(
+                shard.get(key), capacity, refill_rate, time.monotonic()
+            )
+            shard[key] = bucket
+            shard.move_to_end(key)
+
+            if len(shard) > self.shard_size:
+                shard.popitem(last=False)
+
+        return wait
+
+    def record_throttled(self, scope: str) -> int:
+        with self.throttled_lock:
+            self.throttled[scope] += 1
+            return self.throttled[scope]
+
+    def throttled_count(self, scope: str) -> int:
+        return self.throttled[scope]
+
+
+class CacheTokenBucketStore:
+    """
+    Keeps buckets in a Django cache so several processes share them. Reads
+    and writes aren't atomic, so concurrent requests from the same client may
+    occasionally both get through.
+    """
+
+    def __init__(self, alias: str):
+        self.cache = caches[alias]
+
+    def consume(self, key: str, capacity: int, refill_rate: float) -> float:
+        cache_key = "throttle:{}".format(key)
+        bucket, wait = take_token(
+            self.cache.get(cache_key), capacity, refill_rate, time.time()
+        )
+        # A bucket that has been idle long enough to refill is the same as no
+        # bucket, so there is no point keeping it around longer than that.
+        self.cache.set(cache_key, bucket, int(capacity / refill_rate) + 1)
+
+        return wait
+
+    def record_throttled(self, scope: str) -> int:
+        key = "throttled:{}".format(scope)
+
+        if self.cache.add(key, 1, timeout=None):
+            return 1
+
+        return self.cache.incr(key)
+
+    def throttled_count(self, scope: str) -> int:
+        return self.cache.get("throttled:{}".format(scope), 0)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+
+    if _store is None:
+        if settings.THROTTLE_CACHE is None:
+            _store = MemoryTokenBucketStore(settings.THROTTLE_MAX_CLIENTS)
+        else:
+            _store = CacheTokenBucketStore(settings.THROTTLE_CACHE)
+
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    global _store
+
+    if setting in ("THROTTLE_CACHE", "THROTTLE_MAX_CLIENTS"):
+        _store = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Per client IP token bucket. The rate for ``scope`` comes from
+    ``DEFAULT_THROTTLE_RATES``; "30/min" allows bursts of 30 requests and
+    refills one token every two seconds.
+    """
+
+    scope: Optional[str] = None
+
+    def allow_request(self, request, view):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+        if rate is None:
+            return True
+
+        capacity, duration = parse_rate(rate)
+        store = get_store()
+        ip = get_client_ip(request)
+
+        self.wait_seconds = store.consume(
+            "{}:{}".format(self.scope, ip), capacity, capacity / duration
+        )
+
+        if self.wait_seconds > 0:
+            count = store.record_throttled(self.scope)
+
+            # A client hammering the API would flood the log with one line per
+            # request; the counters carry the totals, so only every time the
+            # count doubles is logged.
+            if count & (count - 1) == 0:
+                logger.warning(
+                    "Throttled %s request from %s (%d throttled so far)",
+                    self.scope,
+                    ip,
+                    count,
+                )
+
+            return False
+
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class VoteThrottle(TokenBucketThrottle):
+    scope = "votes"
+
+
+class UserThrottle(TokenBucketThrottle):
+    scope = "users"
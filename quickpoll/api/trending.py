@@ -0,0 +1,109 @@
+import datetime
+import math
+from typing import List
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Subquery
+from django.utils import timezone
+from .models import Poll, TrendingPoll, TrendingState, Vote
+
+# Scores are sums of exp((voted_at - epoch) / TIME_CONSTANT). Every score
+# decays by the same factor as time passes, so the ranking never has to be
+# recomputed; only polls with new votes are touched. The epoch is moved
+# forward now and then to keep the numbers from overflowing.
+TIME_CONSTANT = settings.TRENDING_HALF_LIFE_SECONDS / math.log(2)
+REBASE_AFTER = datetime.timedelta(seconds=settings.TRENDING_HALF_LIFE_SECONDS * 16)
+MIN_SCORE = 1e-3
+
+TRENDING_SIZE = 25
+
+
+def get_state() -> TrendingState:
+    # Migration 0011 creates the state with the right starting watermark; this
+    # only matters if the row has been removed since.
+    state, _ = TrendingState.objects.select_for_update().get_or_create(
+        pk=1, defaults={"epoch": timezone.now()}
+    )
+    return state
+
+
+def rebase(state: TrendingState, now: datetime.datetime):
+    factor = decay_factor(state.epoch, now)
+
+    TrendingPoll.objects.update(score=F("score") * factor)
+    TrendingPoll.objects.filter(score__lt=MIN_SCORE).delete()
+
+    state.epoch = now
+
+
+def decay_factor(epoch: datetime.datetime, now: datetime.datetime) -> float:
+    return math.exp(-(now - epoch).total_seconds() / TIME_CONSTANT)
+
+
+def process_new_votes(batch_size: int = 10000) -> int:
+    """
+    Folds votes newer than the watermark into the ranking and returns how
+    many were processed.
+    """
+    with transaction.atomic():
+        state = get_state()
+        now = timezone.now()
+
+        if now - state.epoch > REBASE_AFTER:
+            rebase(state, now)
+
+        votes = (
+            Vote.objects.filter(id__gt=state.last_vote_id)
+            .order_by("id")
+            .values_list("id", "poll_id", "poll__is_private", "created_at")[
+                :batch_size
+            ]
+        )
+
+        increments = {}
+
+        for vote_id, poll_id, is_private, created_at in votes:
+            state.last_vote_id = vote_id
+
+            if is_private:
+                continue
+
+            seconds = (created_at - state.epoch).total_seconds()
+            increments[poll_id] = increments.get(poll_id, 0) + math.exp(
+                seconds / TIME_CONSTANT
+            )
+
+        existing = TrendingPoll.objects.in_bulk(list(increments.keys()))
+
+        for entry in existing.values():
+            entry.score += increments[entry.poll_id]
+
+        TrendingPoll.objects.bulk_update(existing.values(), ["score"])
+        TrendingPoll.objects.bulk_create(
+            TrendingPoll(poll_id=poll_id, score=score)
+            for poll_id, score in increments.items()
+            if poll_id not in existing
+        )
+
+        state.save()
+
+    return len(votes)
+
+
+def get_trending_polls(limit: int = TRENDING_SIZE) -> List[Poll]:
+    entries = (
+        TrendingPoll.objects.filter(poll__is_private=False)
+        .select_related("poll")
+        .annotate(epoch=Subquery(TrendingState.objects.filter(pk=1).values("epoch")))
+        .order_by("-score")[:limit]
+    )
+
+    now = timezone.now()
+    polls = []
+
+    for entry in entries:
+        rate = entry.score * decay_factor(entry.epoch, now) / (TIME_CONSTANT / 60)
+        entry.poll.votes_per_minute = rate
+        polls.append(entry.poll)
+
+    return polls
@@ -1,8 +1,17 @@
 from django.urls import path
-from .views import PollList, PollDetails, UserList, VoteList
+from .views import (
+    PollList,
+    PollSearch,
+    PollTrending,
+    PollDetails,
+    UserList,
+    VoteList,
+)
 
 urlpatterns = [
     path("polls/", PollList.as_view(), name="polls"),
+    path("polls/search/", PollSearch.as_view(), name="poll_search"),
+    path("polls/trending/", PollTrending.as_view(), name="poll_trending"),
     path("polls/<uuid:pk>", PollDetails.as_view(), name="poll_details"),
     path("users/", UserList.as_view(), name="users"),
     path("votes/", VoteList.as_view(), name="votes"),
@@ -10,10 +10,16 @@ from .serializers import (
     UserSerializer,
     PollDetailSerializer,
     VotePostSerializer,
+    TrendingPollSerializer,
 )
 from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 from .models import Option, Poll, User, Vote
 from .functions import get_client_ip
+from .search import search_polls, encode_cursor, decode_cursor, CursorExpired
+from .trending import get_trending_polls
+from .throttling import VoteThrottle, UserThrottle
+from .routers import read_from_replica, pin_to_primary
 
 
 def get_user_from_ip(ip: str):
@@ -75,6 +81,7 @@ class PollList(APIView):
     def get_paginated_response(self, data):
         return self.paginator.get_paginated_response(data)
 
+    @read_from_replica
     def get(self, request):
         page = self.paginate_queryset(self.queryset)
 
@@ -127,10 +134,71 @@ class PollList(APIView):
         for opt in options:
             Option(poll=poll, value=opt["value"]).save()
 
+        pin_to_primary(request)
+
         return Response(data=poll_serializer.data, status=status.HTTP_200_OK)
 
 
+class PollSearch(APIView):
+    """
+    Searches public poll titles and options for every word in ``q``, best
+    match first. Only the newest 5000 matching polls are ranked; older ones
+    are left out for very common words. Pages are followed through ``next``
+    and keep the ranking of the first page; it expires after ten minutes.
+    """
+
+    def get(self, request, format=None):
+        query = request.query_params.get("q", "").strip()
+
+        if query == "":
+            return Response(
+                data={"message": "Provide a search query."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cursor = None
+
+        if "cursor" in request.query_params:
+            cursor = decode_cursor(request.query_params["cursor"])
+
+            if cursor is None:
+                return Response(
+                    data={"message": "Invalid cursor."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        try:
+            polls, next_cursor = search_polls(query, cursor)
+        except CursorExpired:
+            return Response(
+                data={"message": "Search has expired, start it again."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        next_url = None
+
+        if next_cursor is not None:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), "cursor", encode_cursor(next_cursor)
+            )
+
+        serializer = PollSerializer(polls, many=True)
+
+        return Response(
+            {"next": next_url, "results": serializer.data},
+            status=status.HTTP_200_OK,
+        )
+
+
+class PollTrending(APIView):
+    def get(self, request, format=None):
+        serializer = TrendingPollSerializer(get_trending_polls(), many=True)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 class PollDetails(APIView):
+    @read_from_replica
     def get(self, request, pk, format=None):
         poll = get_poll(pk)
         options = get_options(pk)
@@ -167,6 +235,11 @@ class PollDetails(APIView):
 
 
 class UserList(APIView):
+    # No authentication so that throttling runs before anything touches the
+    # database (session auth would load the session first).
+    authentication_classes = []
+    throttle_classes = [UserThrottle]
+
     def post(self, request, format=None):
         ip = get_client_ip(request)
         user = get_user_from_ip(ip)
@@ -178,6 +251,7 @@ class UserList(APIView):
 
         user = User(ip=ip)
         user.save()
+        pin_to_primary(request)
 
         serializer = UserSerializer(user)
 
@@ -185,6 +259,9 @@ class UserList(APIView):
 
 
 class VoteList(APIView):
+    authentication_classes = []
+    throttle_classes = [VoteThrottle]
+
     def post(self, request, format=None):
         serializer = VotePostSerializer(data=request.data)
 
@@ -246,9 +323,10 @@ class VoteList(APIView):
                 status=status.HTTP_208_ALREADY_REPORTED,
             )
         else:
-            existing_vote.delete()
-
+            # Changing the option updates the vote in place, so it keeps its id
+            # and isn't counted again by the trending worker.
             vote = VotePostSerializer(
+                existing_vote,
                 data={
                     "user": user.id,
                     "poll": request.data["poll"],
@@ -260,4 +338,6 @@ class VoteList(APIView):
         if vote.is_valid():
             vote.save()
 
+        pin_to_primary(request)
+
         return Response(vote.data, status=status_code)
@@ -71,9 +71,32 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+    },
+    # Only used once listed in DATABASE_REPLICAS. The tests get a separate,
+    # unreplicated database for it to check that stale reads are routed right.
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "replica.sqlite3",
+    },
 }
 
+DATABASE_ROUTERS = ["api.routers.ReplicaRouter"]
+
+# Aliases in DATABASES that poll list/detail reads are spread over. To try it
+# locally, copy db.sqlite3 to replica.sqlite3 and set:
+#
+# DATABASE_REPLICAS = ["replica"]
+#
+# With more than one worker process, REPLICA_PIN_CACHE has to name a cache
+# every process shares (Redis, Memcached, database cache), or a write handled
+# by one process won't keep the client's reads in another on the primary.
+DATABASE_REPLICAS = []
+
+# How long a client reads from the primary after writing, which should cover
+# the replication lag, and the cache alias those pins are kept in.
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_CACHE = "default"
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,7 +131,23 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 25,
+    "DEFAULT_THROTTLE_RATES": {
+        "votes": "30/min",
+        "users": "5/min",
+    },
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+
+TRENDING_HALF_LIFE_SECONDS = 10 * 60
+
+# Search rankings are kept here between pages. With several worker processes
+# this has to be a cache they all share.
+SEARCH_CURSOR_CACHE = "default"
+SEARCH_CURSOR_SECONDS = 10 * 60
+
+# Throttle buckets live in process memory unless this names a cache alias,
+# which is needed when running several worker processes.
+THROTTLE_CACHE = None
+THROTTLE_MAX_CLIENTS = 100_000